@@ -0,0 +1,220 @@
+# backtest.py
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from numba import njit, prange
+    _HAVE_NUMBA = True
+except ImportError:
+    # numba is optional: without it the vectorized NumPy path below is used.
+    _HAVE_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        return lambda f: f
+
+
+def sma_multi(x, windows):
+    """
+    Simple moving averages for several windows from one shared prefix sum:
+    a single O(n) pass over the data no matter how many windows. Each
+    result is NaN-padded at the front so it lines up with the input.
+    Returns {window: array}.
+    """
+    csum = np.concatenate(([0.0], np.cumsum(x, dtype=np.float64)))
+    out = {}
+    for w in windows:
+        ma = np.full(x.shape[0], np.nan)
+        if x.shape[0] >= w:
+            ma[w - 1:] = (csum[w:] - csum[:-w]) / w
+        out[w] = ma
+    return out
+
+
+def sma(x, window):
+    """Simple moving average; see sma_multi."""
+    return sma_multi(x, (window,))[window]
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def run_backtest(close, high, low, ma, sl_off, tp_off, win, loss, init_bal, horizon=1):
+    """
+    MA crossover backtest kernel on raw float64 arrays.
+
+    Each trade exits at whichever of TP/SL is touched first within
+    `horizon` bars of entry (TP wins a same-bar tie); horizon=1 is the
+    original entry-bar-only behaviour. Keeps the explicit bar-by-bar loop
+    so path-dependent exits (trailing stops, pyramiding) can be added
+    later without rewriting as array math. Returns full-length per-bar
+    arrays plus a boolean mask of trade bars.
+    """
+    n = close.shape[0]
+    entry = np.empty(n)
+    exit_ = np.empty(n)
+    profit = np.empty(n)
+    balance = np.empty(n)
+    mask = np.zeros(n, np.bool_)
+    if n == 0:
+        return entry, exit_, profit, balance, mask
+
+    bal = init_bal
+    # Track the close-vs-MA sign so each bar costs one comparison; a
+    # bullish cross is simply a False -> True flip.
+    above = close[0] > ma[0]
+    for i in range(1, n):
+        now_above = close[i] > ma[i]
+        if now_above and not above:
+            e = close[i]
+            tp = e + tp_off
+            sl = e - sl_off
+            x = e
+            p = 0.0
+            for j in range(i, min(i + horizon, n)):
+                if high[j] >= tp:
+                    x = tp
+                    p = win
+                    break
+                if low[j] <= sl:
+                    x = sl
+                    p = loss
+                    break
+            bal += p
+            entry[i] = e
+            exit_[i] = x
+            profit[i] = p
+            balance[i] = bal
+            mask[i] = True
+        above = now_above
+    return entry, exit_, profit, balance, mask
+
+
+def run_backtest_vectorized(close, high, low, ma, sl_off, tp_off, win, loss, init_bal, horizon=1):
+    """
+    Pure-NumPy equivalent of run_backtest: crossover detection and
+    first-touch TP/SL resolution over a bounded `horizon` as array
+    expressions, no Python loop. Same return shape and tie rule (TP wins
+    a same-bar tie) as the kernel.
+    """
+    n = close.shape[0]
+    entry = np.empty(n)
+    exit_ = np.empty(n)
+    profit = np.empty(n)
+    balance = np.empty(n)
+    mask = np.zeros(n, np.bool_)
+
+    above = close > ma
+    mask[1:] = above[1:] & ~above[:-1]
+    idx = np.flatnonzero(mask)
+    if n == 0 or idx.size == 0:
+        return entry, exit_, profit, balance, mask
+
+    e = close[idx]
+    tp = e + tp_off
+    sl = e - sl_off
+
+    # Pad so every entry sees a full window, then find the first bar each
+    # level is touched; `h` marks "never touched within the horizon".
+    h = min(horizon, n)
+    high_w = sliding_window_view(np.concatenate((high, np.full(h - 1, -np.inf))), h)[idx]
+    low_w = sliding_window_view(np.concatenate((low, np.full(h - 1, np.inf))), h)[idx]
+    tp_touch = high_w >= tp[:, None]
+    sl_touch = low_w <= sl[:, None]
+    tp_bar = np.where(tp_touch.any(axis=1), tp_touch.argmax(axis=1), h)
+    sl_bar = np.where(sl_touch.any(axis=1), sl_touch.argmax(axis=1), h)
+
+    tp_first = (tp_bar <= sl_bar) & (tp_bar < h)
+    sl_first = sl_bar < tp_bar
+    p = np.where(tp_first, win, np.where(sl_first, loss, 0.0))
+
+    entry[idx] = e
+    exit_[idx] = np.where(tp_first, tp, np.where(sl_first, sl, e))
+    profit[idx] = p
+    balance[idx] = init_bal + np.cumsum(p)
+    return entry, exit_, profit, balance, mask
+
+
+if not _HAVE_NUMBA:
+    run_backtest = run_backtest_vectorized
+
+
+@njit(parallel=True, cache=True, fastmath=True, nogil=True)
+def run_backtests(close2d, high2d, low2d, ma2d, sl_off, tp_off, win, loss, init_bal, horizon=1):
+    """
+    Same crossover kernel over (n_symbols, n_bars) arrays, one symbol per
+    prange worker. Returns 2-D arrays shaped like the inputs.
+    """
+    m, n = close2d.shape
+    entry = np.empty((m, n))
+    exit_ = np.empty((m, n))
+    profit = np.empty((m, n))
+    balance = np.empty((m, n))
+    mask = np.zeros((m, n), np.bool_)
+    if n == 0:
+        return entry, exit_, profit, balance, mask
+
+    for s in prange(m):
+        bal = init_bal
+        above = close2d[s, 0] > ma2d[s, 0]
+        for i in range(1, n):
+            now_above = close2d[s, i] > ma2d[s, i]
+            if now_above and not above:
+                e = close2d[s, i]
+                tp = e + tp_off
+                sl = e - sl_off
+                x = e
+                p = 0.0
+                for j in range(i, min(i + horizon, n)):
+                    if high2d[s, j] >= tp:
+                        x = tp
+                        p = win
+                        break
+                    if low2d[s, j] <= sl:
+                        x = sl
+                        p = loss
+                        break
+                bal += p
+                entry[s, i] = e
+                exit_[s, i] = x
+                profit[s, i] = p
+                balance[s, i] = bal
+                mask[s, i] = True
+            above = now_above
+    return entry, exit_, profit, balance, mask
+
+
+def stack_ohlc(df, symbols, ma_window=21):
+    """
+    Stack a multi-symbol yf.download frame (group_by='ticker') into the
+    (n_symbols, n_bars) float64 arrays run_backtests expects.
+    """
+    close = np.stack([df[s]["Close"].to_numpy(np.float64) for s in symbols])
+    high = np.stack([df[s]["High"].to_numpy(np.float64) for s in symbols])
+    low = np.stack([df[s]["Low"].to_numpy(np.float64) for s in symbols])
+    ma = np.stack([sma(c, ma_window) for c in close])
+    return close, high, low, ma
+
+
+_TRADE_DTYPE = np.dtype([
+    ("Datetime", "datetime64[ns]"),
+    ("Entry", "f4"),
+    ("Exit", "f4"),
+    ("Result ($)", "f4"),
+    ("Balance", "f4")
+])
+
+
+def trades_frame(datetimes, entry, exit_, profit, balance, mask):
+    """
+    Assemble the trades table from the kernel's arrays via one preallocated
+    structured record array — fixed dtypes, no per-trade dicts, and
+    from_records skips pandas' column inference pass.
+    """
+    rec = np.empty(int(mask.sum()), dtype=_TRADE_DTYPE)
+    rec["Datetime"] = datetimes[mask]
+    rec["Entry"] = entry[mask]
+    rec["Exit"] = exit_[mask]
+    rec["Result ($)"] = profit[mask]
+    rec["Balance"] = balance[mask]
+    return pd.DataFrame.from_records(rec)
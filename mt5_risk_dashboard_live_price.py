@@ -1,216 +1,454 @@
 # mt5_risk_dashboard_signals.py
 
+import asyncio
+import base64
+import functools
+import io
+import pathlib
+
 import streamlit as st
+import httpx
 import requests
 import json
+import orjson
+import pyarrow as pa
+from pyarrow import csv as pacsv
 import yfinance as yf
+import numpy as np
 import pandas as pd
 import plotly.graph_objs as go
 from datetime import datetime
 
+from backtest import run_backtest, sma_multi, trades_frame
+from utils.filecache import FileCache
+
+_FILE_CACHE = FileCache()
+
 # === Session State Defaults ===
+_SS_DEFAULTS = {
+    "selected_symbol": "BTCUSD",
+    "plan_exported": False,
+    "account_size": 10000.0,
+    "lot_size": 0.10,
+    "risk_percent": 1.0,
+    "entry_price": 1.1400,
+    "rr_choice": "1:2"
+}
+
+_RR_MAP = {"1:1": 1.0, "1:2": 2.0, "1:3": 3.0}
+
 def ensure_session_state_defaults():
-    defaults = {
-        "selected_symbol": "BTCUSD",
-        "plan_exported": False,
-        "account_size": 10000.0,
-        "lot_size": 0.10,
-        "risk_percent": 1.0,
-        "entry_price": 1.1400,
-        "rr_choice": "1:2"
-    }
-    for key, value in defaults.items():
+    for key, value in _SS_DEFAULTS.items():
         if key not in st.session_state:
             st.session_state[key] = value
 
 ensure_session_state_defaults()
 
 # === Symbol Utilities ===
+@st.cache_resource
+def _api_session():
+    """Pooled HTTP session for the local symbols API, shared across reruns."""
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    return session
+
+@st.cache_data(ttl=3600)
 def load_symbols():
+    # Disk cache first: avoids the 5s timeout tail on the local API after
+    # a server restart empties the in-memory cache.
+    cached = _FILE_CACHE.get("symbols_v1", ttl=300)
+    if cached is not None:
+        return cached
     try:
-        response = requests.get("http://localhost:3600/api/trading/symbols", timeout=5)
+        response = _api_session().get("http://localhost:3600/api/trading/symbols", timeout=5)
         if response.status_code == 200:
-            return response.json()
+            symbols = response.json()
+            _FILE_CACHE.set("symbols_v1", symbols)
+            return symbols
     except Exception:
         with open("symbols_config.json", "r") as f:
             return json.load(f)
 
+_YF_OVERRIDES = {
+    "XAUUSD": "GC=F",
+    "BTCUSD": "BTC-USD",
+    "USDJPY": "USDJPY=X",
+    "EURUSD": "EURUSD=X",
+    "USOIL": "CL=F",
+    "NZDCAD": "NZDCAD=X"
+}
+
+@functools.lru_cache(maxsize=256)
 def map_yf_symbol(mt5_symbol):
-    overrides = {
-        "XAUUSD": "GC=F",
-        "BTCUSD": "BTC-USD",
-        "USDJPY": "USDJPY=X",
-        "EURUSD": "EURUSD=X",
-        "USOIL": "CL=F",
-        "NZDCAD": "NZDCAD=X"
+    return _YF_OVERRIDES.get(mt5_symbol, mt5_symbol + "=X")
+
+@st.cache_resource
+def _ticker(symbol):
+    """
+    One yf.Ticker per symbol per process. Ticker construction does real
+    work (session, cookies, crumb), so keep the instances alive instead of
+    rebuilding them on every fallback fetch.
+    """
+    return yf.Ticker(symbol)
+
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_prices(symbols):
+    """Fetch last close for a tuple of yf symbols in a single download."""
+    prices = {}
+    if len(symbols) == 1:
+        sym = symbols[0]
+        try:
+            hist = _ticker(sym).history(period="1d")
+            if not hist.empty:
+                prices[sym] = round(float(hist["Close"].iloc[-1]), 5)
+        except Exception:
+            pass
+        return prices
+    try:
+        data = yf.download(list(symbols), period="1d", group_by="ticker", threads=True, progress=False)
+    except Exception:
+        return {}
+    for sym in symbols:
+        try:
+            closes = data[sym]["Close"].dropna()
+            if not closes.empty:
+                prices[sym] = round(float(closes.iloc[-1]), 5)
+        except (KeyError, IndexError):
+            pass
+    return prices
+
+# Trading-session windows as inclusive UTC hour bounds.
+_SESSION_HOURS = {"London": (7, 16), "New York": (13, 21)}
+
+# Bars a backtest trade may stay open while waiting for TP or SL.
+_EXIT_HORIZON = 16
+
+_QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+
+async def _fetch_one(client, sym, sem):
+    async with sem:
+        r = await client.get(_QUOTE_URL, params={"symbols": sym})
+        r.raise_for_status()
+        quotes = r.json()["quoteResponse"]["result"]
+        return sym, quotes[0].get("regularMarketPrice") if quotes else None
+
+async def _gather_quotes(symbols):
+    sem = asyncio.Semaphore(8)
+    async with httpx.AsyncClient(timeout=10) as client:
+        pairs = await asyncio.gather(*(_fetch_one(client, s, sem) for s in symbols), return_exceptions=True)
+    return {
+        sym: round(float(price), 5)
+        for item in pairs
+        if not isinstance(item, Exception)
+        for sym, price in [item]
+        if price is not None
     }
-    return overrides.get(mt5_symbol, mt5_symbol + "=X")
 
-def fetch_price(symbol):
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_prices_bulk(symbols):
+    """
+    Fetch live quotes for many symbols concurrently via Yahoo's quote
+    endpoint; any symbol it rejects falls back to the bulk yf download.
+    """
     try:
-        data = yf.Ticker(symbol)
-        hist = data.history(period="1d")
-        if not hist.empty:
-            return round(float(hist["Close"].iloc[-1]), 5)
+        prices = asyncio.run(_gather_quotes(symbols))
     except Exception:
-        return None
+        prices = {}
+    missing = tuple(s for s in symbols if s not in prices)
+    if missing:
+        prices.update(fetch_prices(missing))
+    return prices
+
+def fetch_price(symbol):
+    return fetch_prices_bulk((symbol,)).get(symbol)
+
+def compute_plan(entry, sl, tp, lot, pip, account, risk_pct):
+    """
+    Risk/reward arithmetic for a trade plan. Pure NumPy ufuncs only, so
+    scalar inputs from the UI and ndarray grids (what-if sweeps) both work.
+    """
+    sl_pips = np.abs(entry - sl) / pip
+    tp_pips = np.abs(tp - entry) / pip
+    risk = sl_pips * lot * 10
+    reward = tp_pips * lot * 10
+    rr = np.where(risk == 0, 0.0, reward / np.where(risk == 0, 1.0, risk))
+    suggested_lot = np.where(sl_pips == 0, 0.0, (account * risk_pct / 100) / np.where(sl_pips == 0, 1.0, sl_pips * 10))
+    return {
+        "sl_pips": sl_pips,
+        "tp_pips": tp_pips,
+        "risk": risk,
+        "reward": reward,
+        "rr": rr,
+        "suggested_lot": suggested_lot
+    }
+
+def _frame_sig(df):
+    """
+    Hashable fingerprint of a frame. Cached helpers that exclude their _df
+    from hashing must include this in the key, otherwise they keep serving
+    results computed from bars that cached_download has since refreshed.
+    """
+    return (len(df), df.index[-1] if len(df) else None)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def csv_bytes(yf_symbol, period, interval, session_filter, fingerprint, _df):
+    """Serialize the filtered frame once per signature for the download button."""
+    buf = io.BytesIO()
+    pacsv.write_csv(pa.Table.from_pandas(_df, preserve_index=True), buf)
+    return buf.getvalue()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def cached_download(symbol, period, interval):
+    """One Yahoo history download per (symbol, period, interval) per 5 minutes."""
+    return yf.download(symbol, period=period, interval=interval, progress=False, threads=False)
+
+def downsample_ohlc(df, target=1500):
+    """Resample DatetimeIndex'd OHLC bars down to roughly `target` rows for plotting."""
+    if len(df) <= 2000:
+        return df
+    spacing = df.index.to_series().diff().median()
+    rule = spacing * int(np.ceil(len(df) / target))
+    return (
+        df.resample(rule)
+        .agg({"Open": "first", "High": "max", "Low": "min", "Close": "last", "MA9": "last", "MA21": "last"})
+        .dropna()
+    )
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def build_chart(yf_symbol, period, interval, session_filter, fingerprint, _df):
+    """Build the candlestick figure once per fetch; reruns reuse the cached copy."""
+    plot_df = downsample_ohlc(_df)
+    # Hand Plotly plain float32 arrays: skips Series dtype inference and
+    # roughly halves the JSON payload shipped to the browser.
+    x = plot_df.index.to_numpy()
+    fig = go.Figure()
+    fig.add_trace(go.Candlestick(
+        x=x,
+        open=plot_df["Open"].to_numpy(np.float32),
+        high=plot_df["High"].to_numpy(np.float32),
+        low=plot_df["Low"].to_numpy(np.float32),
+        close=plot_df["Close"].to_numpy(np.float32),
+        name="Price"
+    ))
+    fig.add_trace(go.Scatter(x=x, y=plot_df["MA9"].to_numpy(np.float32), line=dict(color='blue'), name="MA9"))
+    fig.add_trace(go.Scatter(x=x, y=plot_df["MA21"].to_numpy(np.float32), line=dict(color='red'), name="MA21"))
+    fig.update_layout(uirevision="keep", xaxis_rangeslider_visible=False)
+    return fig
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def cached_backtest(yf_symbol, period, interval, session_filter, fingerprint, _df):
+    """Run the Numba kernel once per (symbol, period, interval, session, data) combo."""
+    return run_backtest(
+        _df["Close"].to_numpy(np.float64),
+        _df["High"].to_numpy(np.float64),
+        _df["Low"].to_numpy(np.float64),
+        _df["MA21"].to_numpy(np.float64),
+        0.0020, 0.0030, 1500.0, -1000.0, 100000.0, _EXIT_HORIZON
+    )
+
+@st.cache_resource
+def symbol_catalog():
+    """
+    Symbol names plus O(1) lookup maps, built once per server process.
+    cache_resource shares the same objects across reruns — treat them as
+    read-only.
+    """
+    symbols = load_symbols()
+    symbols.extend([
+        {"symbol": "USOIL", "pip_precision": 0.1},
+        {"symbol": "NZDCAD", "pip_precision": 0.0001}
+    ])
+    names = [s["symbol"] for s in symbols]
+    pip_map = {s["symbol"]: s["pip_precision"] for s in symbols}
+    return names, pip_map
+
+@functools.cache
+def _logo_b64():
+    """Logo encoded once at first render; reruns reuse the data URI with no file I/O."""
+    return base64.b64encode(pathlib.Path("images/logo.png").read_bytes()).decode()
+
+# === Header ===
+st.markdown(
+    f"<div style='display:flex;align-items:center'>"
+    f"<img src='data:image/png;base64,{_logo_b64()}' width='50'>"
+    f"<h2 style='margin:0 0 0 12px'>MT5 Risk Dashboard</h2></div>",
+    unsafe_allow_html=True
+)
 
 # === Load Symbols ===
-symbols = load_symbols()
-symbols.extend([
-    {"symbol": "USOIL", "pip_precision": 0.1},
-    {"symbol": "NZDCAD", "pip_precision": 0.0001}
-])
-symbol_names = [s["symbol"] for s in symbols]
-selected_symbol = st.selectbox("🧭 Select Symbol", options=symbol_names, index=symbol_names.index(st.session_state.selected_symbol))
-st.session_state.selected_symbol = selected_symbol
-pip_precision = next((s["pip_precision"] for s in symbols if s["symbol"] == selected_symbol), 0.0001)
+symbol_names, pip_map = symbol_catalog()
+selected_symbol = st.selectbox("🧭 Select Symbol", options=symbol_names, key="selected_symbol")
+pip_precision = pip_map.get(selected_symbol, 0.0001)
 yf_symbol = map_yf_symbol(selected_symbol)
 live_price = fetch_price(yf_symbol)
 
-# === Trade Settings ===
-st.markdown("### ⚙️ Trade Settings")
-st.session_state.account_size = st.number_input("💼 Account Balance ($)", min_value=100.0, value=st.session_state.account_size, step=100.0)
-st.session_state.lot_size = st.number_input("📦 Lot Size", min_value=0.01, value=st.session_state.lot_size, step=0.01)
-st.session_state.risk_percent = st.number_input("🎯 Risk per Trade (%)", min_value=0.1, max_value=10.0, value=st.session_state.risk_percent, step=0.1)
-st.session_state.entry_price = st.number_input("🎯 Entry Price", value=live_price or st.session_state.entry_price, format="%.5f")
-st.session_state.rr_choice = st.selectbox("📐 Risk:Reward", ["1:1", "1:2", "1:3"], index=["1:1", "1:2", "1:3"].index(st.session_state.rr_choice))
-
-account_size = st.session_state.account_size
-lot_size = st.session_state.lot_size
-risk_percent = st.session_state.risk_percent
-entry_price = st.session_state.entry_price
-rr_value = {"1:1": 1.0, "1:2": 2.0, "1:3": 3.0}[st.session_state.rr_choice]
-
-risk_dollar = account_size * (risk_percent / 100)
-sl_pips = risk_dollar / (lot_size * 10)
-tp_pips = sl_pips * rr_value
-sl_price = entry_price - (sl_pips * pip_precision)
-tp_price = entry_price + (tp_pips * pip_precision)
-
-stop_loss_price = st.number_input("🛑 Stop Loss Price", value=sl_price, format="%.5f")
-take_profit_price = st.number_input("🎯 Take Profit Price", value=tp_price, format="%.5f")
-
-sl_pips = abs(entry_price - stop_loss_price) / pip_precision
-tp_pips = abs(take_profit_price - entry_price) / pip_precision
-risk_amount = sl_pips * lot_size * 10
-reward_amount = tp_pips * lot_size * 10
-rr_ratio = reward_amount / risk_amount if risk_amount else 0
-suggested_lot_size = (account_size * risk_percent / 100) / (sl_pips * 10) if sl_pips else 0
-
-# === Trade Summary ===
-st.subheader("📊 Trade Summary")
-if live_price:
-    st.info(f"💹 Current {selected_symbol} Price: {live_price}")
-else:
-    st.warning("⚠️ Live price unavailable.")
-
-cols = st.columns(3)
-cols[0].metric("SL", f"{sl_pips:.1f} pips")
-cols[1].metric("TP", f"{tp_pips:.1f} pips")
-cols[2].metric("R:R", f"{rr_ratio:.2f}")
-cols2 = st.columns(2)
-cols2[0].metric("Risk ($)", f"${risk_amount:.2f}")
-cols2[1].metric("Reward ($)", f"${reward_amount:.2f}")
-st.caption(f"Suggested Lot Size: {suggested_lot_size:.2f}")
-
-# === Export ===
-custom_path = st.text_input("📁 Export Path", value="trade_risk_calc.json")
-if st.button("📤 Export Trade Plan"):
-    trade_data = {
-        "symbol": st.session_state.selected_symbol,
-        "yf_symbol": map_yf_symbol(st.session_state.selected_symbol),
-        "lot_size": lot_size,
-        "account_size": account_size,
-        "risk_percent": risk_percent,
-        "entry_price": entry_price,
-        "stop_loss": stop_loss_price,
-        "take_profit": take_profit_price,
-        "pip_precision": pip_precision,
-        "stop_loss_pips": round(sl_pips, 1),
-        "take_profit_pips": round(tp_pips, 1),
-        "risk_usd": round(risk_amount, 2),
-        "reward_usd": round(reward_amount, 2),
-        "rr_ratio": round(rr_ratio, 2),
-        "suggested_lot_size": round(suggested_lot_size, 2),
-        "created_at": str(datetime.now())
-    }
-    with open(custom_path, "w") as f:
-        json.dump(trade_data, f, indent=2)
-    st.success(f"✅ Saved to {custom_path}")
+# Seed the entry price from the live quote once per symbol; afterwards the
+# entry_price widget owns its own state.
+if live_price and st.session_state.get("entry_seeded_for") != selected_symbol:
+    st.session_state.entry_price = live_price
+    st.session_state.entry_seeded_for = selected_symbol
+
+# === Live Price ===
+@st.fragment(run_every=30)
+def price_panel():
+    """Live price readout; reruns by itself every 30s (matching the quote TTL)."""
+    price = fetch_price(yf_symbol)
+    if price:
+        st.info(f"💹 Current {selected_symbol} Price: {price}")
+    else:
+        st.warning("⚠️ Live price unavailable.")
+
+# === Trade Settings / Summary / Export ===
+@st.fragment
+def trade_plan_fragment():
+    """Trade settings, summary and export; edits here rerun only this block."""
+    st.markdown("### ⚙️ Trade Settings")
+    st.number_input("💼 Account Balance ($)", min_value=100.0, step=100.0, key="account_size")
+    st.number_input("📦 Lot Size", min_value=0.01, step=0.01, key="lot_size")
+    st.number_input("🎯 Risk per Trade (%)", min_value=0.1, max_value=10.0, step=0.1, key="risk_percent")
+    st.number_input("🎯 Entry Price", format="%.5f", key="entry_price")
+    st.selectbox("📐 Risk:Reward", ["1:1", "1:2", "1:3"], key="rr_choice")
+
+    account_size = st.session_state.account_size
+    lot_size = st.session_state.lot_size
+    risk_percent = st.session_state.risk_percent
+    entry_price = st.session_state.entry_price
+    rr_value = _RR_MAP[st.session_state.rr_choice]
+
+    risk_dollar = account_size * (risk_percent / 100)
+    sl_pips = risk_dollar / (lot_size * 10)
+    tp_pips = sl_pips * rr_value
+    sl_price = entry_price - (sl_pips * pip_precision)
+    tp_price = entry_price + (tp_pips * pip_precision)
+
+    stop_loss_price = st.number_input("🛑 Stop Loss Price", value=sl_price, format="%.5f")
+    take_profit_price = st.number_input("🎯 Take Profit Price", value=tp_price, format="%.5f")
+
+    plan = compute_plan(entry_price, stop_loss_price, take_profit_price, lot_size, pip_precision, account_size, risk_percent)
+    sl_pips = plan["sl_pips"]
+    tp_pips = plan["tp_pips"]
+    risk_amount = plan["risk"]
+    reward_amount = plan["reward"]
+    rr_ratio = plan["rr"]
+    suggested_lot_size = plan["suggested_lot"]
+
+    # === Trade Summary ===
+    st.subheader("📊 Trade Summary")
+    price_panel()
+
+    cols = st.columns(3)
+    cols[0].metric("SL", f"{sl_pips:.1f} pips")
+    cols[1].metric("TP", f"{tp_pips:.1f} pips")
+    cols[2].metric("R:R", f"{rr_ratio:.2f}")
+    cols2 = st.columns(2)
+    cols2[0].metric("Risk ($)", f"${risk_amount:.2f}")
+    cols2[1].metric("Reward ($)", f"${reward_amount:.2f}")
+    st.caption(f"Suggested Lot Size: {suggested_lot_size:.2f}")
+
+    # === Export ===
+    custom_path = st.text_input("📁 Export Path", value="trade_risk_calc.json")
+    if st.button("📤 Export Trade Plan"):
+        trade_data = {
+            "symbol": st.session_state.selected_symbol,
+            "yf_symbol": map_yf_symbol(st.session_state.selected_symbol),
+            "lot_size": lot_size,
+            "account_size": account_size,
+            "risk_percent": risk_percent,
+            "entry_price": entry_price,
+            "stop_loss": stop_loss_price,
+            "take_profit": take_profit_price,
+            "pip_precision": pip_precision,
+            "stop_loss_pips": round(float(sl_pips), 1),
+            "take_profit_pips": round(float(tp_pips), 1),
+            "risk_usd": round(float(risk_amount), 2),
+            "reward_usd": round(float(reward_amount), 2),
+            "rr_ratio": round(float(rr_ratio), 2),
+            "suggested_lot_size": round(float(suggested_lot_size), 2),
+            "created_at": datetime.now()
+        }
+        pathlib.Path(custom_path).write_bytes(
+            orjson.dumps(trade_data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+        )
+        st.success(f"✅ Saved to {custom_path}")
 
 # === Chart + Backtest ===
-with st.expander("📈 Historical Price Chart + Backtest"):
-    period = st.selectbox("🗓️ Period", ["5d", "7d", "1mo", "3mo", "6mo", "12mo"], index=5)
-    interval = st.selectbox("⏱️ Interval", ["1h", "30m", "15m"])
-    session_filter = st.selectbox("🕒 Session Filter", ["All", "London", "New York"], index=0)
-
-    if st.button("📅 Fetch, Filter & Backtest"):
-        df = yf.download(yf_symbol, period=period, interval=interval)
-
-        if df.empty:
-            st.warning("No data returned from Yahoo Finance.")
-        else:
-            df.index = df.index.tz_localize(None)
-            df.reset_index(inplace=True)
-
-            df["Hour"] = df["Datetime"].dt.hour
-            if session_filter == "London":
-                df = df[df["Hour"].between(7, 16)]
-            elif session_filter == "New York":
-                df = df[df["Hour"].between(13, 21)]
-
-            csv = df.to_csv(index=False).encode("utf-8")
+@st.fragment
+def chart_backtest_fragment():
+    """Chart and backtest expander; its buttons rerun only this block."""
+    with st.expander("📈 Historical Price Chart + Backtest"):
+        period = st.selectbox("🗓️ Period", ["5d", "7d", "1mo", "3mo", "6mo", "12mo"], index=5)
+        interval = st.selectbox("⏱️ Interval", ["1h", "30m", "15m"])
+        session_filter = st.selectbox("🕒 Session Filter", ["All", "London", "New York"], index=0)
+
+        # Compute on click, render from session state: the result then
+        # survives later reruns instead of vanishing when the button resets.
+        sig = (yf_symbol, period, interval, session_filter)
+        if st.button("📅 Fetch, Filter & Backtest"):
+            df = cached_download(yf_symbol, period, interval)
+
+            if df.empty:
+                st.session_state.pop("backtest_result", None)
+                st.warning("No data returned from Yahoo Finance.")
+            else:
+                df.index = df.index.tz_localize(None)
+                # Current yfinance returns MultiIndex (Price, Ticker)
+                # columns even for a single symbol; flatten to plain OHLC
+                # names so the column selects below yield 1-D arrays.
+                if isinstance(df.columns, pd.MultiIndex):
+                    df.columns = df.columns.droplevel(1)
+                # Keep only the OHLC columns, downcast to float32: the
+                # rolling/backtest passes are memory-bound, so halving the
+                # bytes moved roughly halves their cost.
+                df = df[["Open", "High", "Low", "Close"]].astype(np.float32)
+
+                if session_filter != "All":
+                    hours = df.index.to_numpy().astype("datetime64[h]").astype(np.int64) % 24
+                    lo, hi = _SESSION_HOURS[session_filter]
+                    df = df[(hours >= lo) & (hours <= hi)]
+
+                csv = csv_bytes(yf_symbol, period, interval, session_filter, _frame_sig(df), df)
+
+                mas = sma_multi(df["Close"].to_numpy(), (9, 21))
+                df["MA9"] = mas[9]
+                df["MA21"] = mas[21]
+                df = df[df["MA21"].notna()]
+
+                entry, exit_price, profit, balance_curve, mask = cached_backtest(
+                    yf_symbol, period, interval, session_filter, _frame_sig(df), df
+                )
+                st.session_state.backtest_result = {
+                    "sig": sig,
+                    "csv": csv,
+                    "fig": build_chart(yf_symbol, period, interval, session_filter, _frame_sig(df), df),
+                    "datetimes": df.index.to_numpy(),
+                    "entry": entry,
+                    "exit": exit_price,
+                    "profit": profit,
+                    "balance": balance_curve,
+                    "mask": mask
+                }
+
+        result = st.session_state.get("backtest_result")
+        if result and result["sig"] == sig:
             filename = f"{selected_symbol}_{period}_{interval}_{session_filter}.csv"
-            st.download_button("⬇️ Download Filtered CSV", data=csv, file_name=filename)
-
-            df["MA21"] = df["Close"].rolling(21).mean()
-            df.dropna(inplace=True)
-            df.reset_index(drop=True, inplace=True)
-
-            fig = go.Figure()
-            fig.add_trace(go.Candlestick(x=df["Datetime"], open=df["Open"], high=df["High"], low=df["Low"], close=df["Close"], name="Price"))
-            fig.add_trace(go.Scatter(x=df["Datetime"], y=df["MA21"], line=dict(color='red'), name="MA21"))
-            st.plotly_chart(fig, use_container_width=True)
-
-            trades = []
-            balance = 100000
-            for i in range(1, len(df)):
-                try:
-                    prev_close = df.iloc[i - 1]["Close"]
-                    prev_ma21 = df.iloc[i - 1]["MA21"]
-                    curr_close = df.iloc[i]["Close"]
-                    curr_ma21 = df.iloc[i]["MA21"]
-
-                    if prev_close < prev_ma21 and curr_close > curr_ma21:
-                        entry = curr_close
-                        sl = entry - 0.0020
-                        tp = entry + 0.0030
-                        high = df.iloc[i]["High"]
-                        low = df.iloc[i]["Low"]
-
-                        exit_price = tp if high >= tp else (sl if low <= sl else curr_close)
-                        profit = 1500 if exit_price >= tp else (-1000 if exit_price <= sl else 0)
-                        balance += profit
-
-                        trades.append({
-                            "Datetime": df.iloc[i]["Datetime"],
-                            "Entry": entry,
-                            "Exit": exit_price,
-                            "Result ($)": profit,
-                            "Balance": balance
-                        })
-                except Exception as e:
-                    st.warning(f"⚠️ Skipped row {i} due to: {e}")
-
-            if trades:
-                results_df = pd.DataFrame(trades)
-                st.line_chart(results_df.set_index("Datetime")["Balance"])
+            st.download_button("⬇️ Download Filtered CSV", data=result["csv"], file_name=filename)
+            st.plotly_chart(result["fig"], use_container_width=True)
+
+            mask = result["mask"]
+            balance_curve = result["balance"]
+            if mask.any():
+                dt_arr = result["datetimes"]
+                results_df = trades_frame(dt_arr, result["entry"], result["exit"], result["profit"], balance_curve, mask)
+                balance_series = pd.Series(balance_curve[mask], index=pd.DatetimeIndex(dt_arr[mask], name="Datetime"), name="Balance")
+                st.line_chart(balance_series)
                 st.dataframe(results_df)
-                st.success(f"✅ Total Trades: {len(results_df)}, Final Balance: ${balance:,.2f}")
+                st.success(f"✅ Total Trades: {len(results_df)}, Final Balance: ${balance_curve[mask][-1]:,.2f}")
             else:
                 st.info("No breakout trades triggered in this dataset.")
 
+trade_plan_fragment()
+chart_backtest_fragment()
+
 # === Footer ===
 st.markdown("---")
 st.caption("© 2025 Torama. All rights reserved.")
@@ -1,9 +1,16 @@
 import streamlit as st
 from symbol_loader import load_symbols
 
-symbols = load_symbols()
-symbol_names = [s["symbol"] for s in symbols]
+@st.cache_resource
+def symbol_catalog():
+    """Symbol names plus an O(1) pip-precision map, built once per process."""
+    symbols = load_symbols()
+    names = [s["symbol"] for s in symbols]
+    pip_map = {s["symbol"]: s["pip_precision"] for s in symbols}
+    return names, pip_map
+
+symbol_names, pip_map = symbol_catalog()
 selected_symbol = st.selectbox("🧭 Select Trading Symbol", options=symbol_names, index=symbol_names.index("EURUSD"))
 
 # Match selected pip precision
-pip_precision = next((s["pip_precision"] for s in symbols if s["symbol"] == selected_symbol), 0.0001)
+pip_precision = pip_map.get(selected_symbol, 0.0001)
@@ -1,14 +1,32 @@
 import requests
 import json
+from requests.adapters import HTTPAdapter
+
+from utils.filecache import FileCache
+
+# Reuse one pooled connection to the local API across calls instead of a
+# fresh TCP handshake per request.
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+_CACHE = FileCache()
+_SYMBOLS_KEY = "symbols_v1"
+_SYMBOLS_TTL = 300
 
 def load_symbols():
     """
-    Load symbol list from localhost API, fallback to local JSON.
+    Load symbol list from the disk cache, then the localhost API,
+    fallback to local JSON.
     """
+    cached = _CACHE.get(_SYMBOLS_KEY, _SYMBOLS_TTL)
+    if cached is not None:
+        return cached
     try:
-        response = requests.get("http://localhost:3600/api/trading/symbols", timeout=5)
+        response = _SESSION.get("http://localhost:3600/api/trading/symbols", timeout=5)
         if response.status_code == 200:
-            return response.json()
+            symbols = response.json()
+            _CACHE.set(_SYMBOLS_KEY, symbols)
+            return symbols
     except Exception:
         print("⚠️ Could not fetch from API. Loading local symbol config.")
         with open("symbols_config.json", "r") as f:
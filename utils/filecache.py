@@ -0,0 +1,43 @@
+# utils/filecache.py
+
+import gzip
+import hashlib
+import json
+import os
+import time
+
+class FileCache:
+    """
+    Tiny disk-backed TTL cache: gz-compressed JSON payloads keyed by a
+    string, stored under `.cache/` with the write timestamp embedded so
+    readers enforce their own TTL on get().
+    """
+
+    def __init__(self, cache_dir=".cache"):
+        self.cache_dir = cache_dir
+
+    def _path(self, key):
+        digest = hashlib.md5(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".json.gz")
+
+    def get(self, key, ttl):
+        """Return the cached payload for `key`, or None if missing/expired."""
+        try:
+            with gzip.open(self._path(key), "rt", encoding="utf-8") as f:
+                wrapper = json.load(f)
+            if time.time() - wrapper["ts"] < ttl:
+                return wrapper["data"]
+        except Exception:
+            # Any unreadable entry (missing, truncated, corrupt) is a miss.
+            pass
+        return None
+
+    def set(self, key, value):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        # Write to a temp file and rename so readers never see a
+        # half-written entry.
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump({"ts": time.time(), "data": value}, f)
+        os.replace(tmp, path)